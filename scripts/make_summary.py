@@ -1,10 +1,19 @@
 from __future__ import annotations
 
 from pathlib import Path
+import argparse
 import json
+import sys
 import pandas as pd
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from bootcamp_data.bootstrap import bootstrap_ci  # noqa: E402
+from bootcamp_data.etl import clean_status, orders_clean_files, read_orders_clean  # noqa: E402
+from bootcamp_data.schema import apply_schema  # noqa: E402
+from bootcamp_data.timeseries import bucket, bucket_label  # noqa: E402
+
 PROCESSED = ROOT / "data" / "processed"
 REPORTS = ROOT / "reports"
 OUT_MD = REPORTS / "summary.md"
@@ -19,14 +28,34 @@ def _fmt_money(x: float) -> str:
 
 def _normalize_status(df: pd.DataFrame) -> pd.DataFrame:
     """Ensure status_clean exists if possible."""
-    out = df.copy()
-    if "status_clean" in out.columns:
-        return out
-    if "status" in out.columns:
-        s = out["status"].astype("string").str.strip().str.lower()
-        s = s.replace({"refunded": "refund"})
-        out["status_clean"] = s
-    return out
+    if "status_clean" not in df.columns and "status" in df.columns:
+        df["status_clean"] = clean_status(df["status"])
+    return df
+
+
+def _bootstrap_section(df: pd.DataFrame, n_boot: int, n_jobs: int) -> str:
+    """Markdown lines with bootstrap CIs, or an empty string if they can't be computed."""
+    if n_boot <= 0 or "amount" not in df.columns or len(df) == 0:
+        return ""
+    cis = bootstrap_ci(df, n_boot=n_boot, n_jobs=n_jobs, seed=0)
+
+    def fmt(metric: str, x: float) -> str:
+        if metric == "refund_rate":
+            return f"{x * 100:.1f}%" if pd.notna(x) else "N/A"
+        return _fmt_money(x) if pd.notna(x) else "N/A"
+
+    lines = [
+        f"## Bootstrap Confidence Intervals (95%, {n_boot} resamples)",
+        "| Country | Revenue | AOV | Median amount | Refund rate |",
+        "|---|---|---|---|---|",
+    ]
+    for country, g in cis.groupby("country", sort=False):
+        cells = [
+            f"{fmt(r.metric, r.estimate)} [{fmt(r.metric, r.ci_low)}, {fmt(r.metric, r.ci_high)}]"
+            for r in g.itertuples()
+        ]
+        lines.append(f"| {country} | " + " | ".join(cells) + " |")
+    return "\n".join(lines) + "\n\n"
 
 
 def _load_run_meta() -> dict:
@@ -36,7 +65,23 @@ def _load_run_meta() -> dict:
     return {}
 
 
+def _meta_describes(meta: dict, path: Path, n_rows: int) -> bool:
+    """True if the run meta was written by the full ETL run that produced `path`."""
+    out = meta.get("outputs", {}).get("orders_clean")
+    return (
+        meta.get("scope") == "full"
+        and out is not None
+        and Path(out).resolve() == path.resolve()
+        and meta.get("row_counts", {}).get("orders_clean") == n_rows
+    )
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Write reports/summary.md from processed data.")
+    parser.add_argument("--n-boot", type=int, default=1000, help="bootstrap resamples for CIs (0 to skip)")
+    parser.add_argument("--n-jobs", type=int, default=1, help="worker processes for the bootstrap")
+    args = parser.parse_args()
+
     REPORTS.mkdir(parents=True, exist_ok=True)
 
     meta = _load_run_meta()
@@ -47,14 +92,17 @@ def main() -> None:
     orders_path = PROCESSED / "orders.parquet"
     users_path = PROCESSED / "users.parquet"
 
+    etl_source = False
     if analytics_path.exists():
         df = pd.read_parquet(analytics_path)
         source_note = "analytics_table.parquet (joined, analysis-ready)"
     else:
-        # Fallback: merge orders + users, but enforce user_id types first
-        if orders_clean_path.exists():
-            orders = pd.read_parquet(orders_clean_path)
+        # Fallback: merge orders + users
+        if orders_clean_files(orders_clean_path):
+            # Full-run file plus any incremental batches, latest version per order
+            orders = read_orders_clean(orders_clean_path)
             source_note = "orders_clean.parquet + users.parquet (merged)"
+            etl_source = _meta_describes(meta, orders_clean_path, len(orders))
         elif orders_path.exists():
             orders = pd.read_parquet(orders_path)
             source_note = "orders.parquet + users.parquet (merged)"
@@ -65,24 +113,17 @@ def main() -> None:
             raise FileNotFoundError("Missing processed users.parquet.")
         users = pd.read_parquet(users_path)
 
-        # Force merge key dtype to string on both sides
-        if "user_id" in orders.columns:
-            orders["user_id"] = orders["user_id"].astype("string")
-        if "user_id" in users.columns:
-            users["user_id"] = users["user_id"].astype("string")
+        # No-op when the files were written by the typed readers
+        orders = apply_schema(orders, "orders")
+        users = apply_schema(users, "users")
 
         orders = _normalize_status(orders)
         df = orders.merge(users, on="user_id", how="left", suffixes=("", "_user"))
 
     df = _normalize_status(df)
 
-    # Parse created_at safely (if exists)
-    if "created_at" in df.columns:
-        df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce", utc=True)
-
-    # Ensure amount numeric (if exists)
-    if "amount" in df.columns and not pd.api.types.is_numeric_dtype(df["amount"]):
-        df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+    # created_at -> UTC datetime, amount -> float64; only casts columns not already typed
+    df = apply_schema(df, "analytics")
 
     # Refund filtering
     non_refund = df
@@ -105,7 +146,7 @@ def main() -> None:
     # Revenue by country
     top_country_line = "N/A"
     if "country" in non_refund.columns and "amount" in non_refund.columns and pd.notna(total_revenue) and total_revenue != 0:
-        rev_by_country = non_refund.groupby("country", dropna=False)["amount"].sum().sort_values(ascending=False)
+        rev_by_country = non_refund.groupby("country", dropna=False, observed=True)["amount"].sum().sort_values(ascending=False)
         if len(rev_by_country) > 0:
             top_country = rev_by_country.index[0]
             top_rev = float(rev_by_country.iloc[0])
@@ -115,12 +156,12 @@ def main() -> None:
     # Monthly revenue trend
     monthly_growth_line = "N/A"
     if "created_at" in non_refund.columns and "amount" in non_refund.columns:
-        tmp = non_refund.dropna(subset=["created_at"]).copy()
+        tmp = non_refund.dropna(subset=["created_at"])
         if len(tmp) > 0:
-            tmp["month"] = tmp["created_at"].dt.to_period("M").astype(str)
-            rev_by_month = tmp.groupby("month")["amount"].sum().sort_index()
+            months, _ = bucket(tmp["created_at"], "month")
+            rev_by_month = tmp["amount"].groupby(months).sum().sort_index()
             if len(rev_by_month) >= 2:
-                m1, m2 = rev_by_month.index[-2], rev_by_month.index[-1]
+                m1, m2 = bucket_label(rev_by_month.index[-2:], "month")
                 v1, v2 = float(rev_by_month.iloc[-2]), float(rev_by_month.iloc[-1])
                 if v1 != 0:
                     pct = ((v2 - v1) / v1) * 100
@@ -141,7 +182,7 @@ def main() -> None:
         if "country" in df.columns:
             joined = df[df["country"].notna()].copy()
             if len(joined) > 0:
-                grp = joined.groupby("country")["status_clean"].apply(lambda s: (s == "refund").mean() * 100).sort_values(ascending=False)
+                grp = joined.groupby("country", observed=True)["status_clean"].apply(lambda s: (s == "refund").mean() * 100).sort_values(ascending=False)
                 if len(grp) >= 2:
                     c_hi, c_lo = grp.index[0], grp.index[-1]
                     diff = float(grp.iloc[0] - grp.iloc[-1])
@@ -165,7 +206,11 @@ def main() -> None:
 
     # Duplicates (if order_id exists)
     duplicates_line = "N/A"
-    if "order_id" in df.columns:
+    if etl_source and meta.get("dedup", {}).get("rows_dropped") is not None:
+        # Data is the ETL's deduped output; its meta count is authoritative
+        dup_n = int(meta["dedup"]["rows_dropped"])
+        duplicates_line = "No duplicate order_id rows detected" if dup_n == 0 else f"Dropped {dup_n} duplicate order_id rows (kept latest by created_at)"
+    elif "order_id" in df.columns:
         dup_n = int(df["order_id"].duplicated().sum())
         duplicates_line = "No duplicate order_id rows detected" if dup_n == 0 else f"Found {dup_n} duplicate order_id rows"
 
@@ -181,6 +226,8 @@ def main() -> None:
             outliers_line = f"{out_n} rows above the 99th percentile amount ({_fmt_money(p99)}) flagged as outliers"
             winsor_line = f"Winsorized amount caps values at p01={_fmt_money(p01)} and p99={_fmt_money(p99)} for cleaner charts"
 
+    bootstrap_md = _bootstrap_section(df, args.n_boot, args.n_jobs)
+
     md = f"""# Summary of Findings and Caveats
 
 _Source used: **{source_note}**_
@@ -191,7 +238,7 @@ _Source used: **{source_note}**_
 - **Finding 3 (quantified)**: Average order value (AOV) is {_fmt_money(aov_mean)}, with median {_fmt_money(aov_median)}
 - **Finding 4 (quantified)**: {refund_country_line if refund_country_line != "N/A" else refund_rate_line}
 
-## Definitions
+{bootstrap_md}## Definitions
 - **Revenue**: Sum of `amount` over orders (refunds excluded if `status_clean == "refund"` is available)
 - **AOV (Average Order Value)**: Mean of `amount`
 - **Refund rate**: Proportion of orders where `status_clean == "refund"` (or derived from `status`)
@@ -214,7 +261,7 @@ _Source used: **{source_note}**_
 - {winsor_line}
 
 ### Other Issues
-- Status normalization was applied (lowercasing + mapping refunded→refund) if `status_clean` was not present.
+- Status normalization was applied (lowercasing + mapping refunded/returned→refund) if `status_clean` was not present.
 
 ## Next Questions
 - How does refund rate vary by month?
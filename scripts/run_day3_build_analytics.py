@@ -7,9 +7,12 @@ sys.path.insert(0, str(ROOT / "src"))
 
 from bootcamp_data.transforms import parse_datetime, add_time_parts, winsorize, add_outlier_flag
 from bootcamp_data.joins import safe_left_join
+from bootcamp_data.schema import apply_schema
+from bootcamp_data.etl import read_orders_clean
 
 def main():
-    orders = pd.read_parquet("data/processed/orders_clean.parquet")
+    # Full-run file plus any incremental batches, latest version per order
+    orders = read_orders_clean(Path("data/processed/orders_clean.parquet"))
     users = pd.read_parquet("data/processed/users.parquet")
 
     orders = parse_datetime(orders, col="created_at")
@@ -25,12 +28,14 @@ def main():
 
     analytics_df["amount_winsor"] = winsorize(analytics_df["amount"])
     analytics_df = add_outlier_flag(analytics_df, "amount")
+    # Re-dictionary-encode the join key (categories differ between orders and users)
+    analytics_df = apply_schema(analytics_df, "analytics")
 
     output_path = "data/processed/analytics_table.parquet"
     analytics_df.to_parquet(output_path, index=False)
     
     summary = (
-        analytics_df.groupby("country", dropna=False)
+        analytics_df.groupby("country", dropna=False, observed=True)
         .agg(
             order_count=("order_id", "size"),
             total_revenue=("amount", "sum")
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+METRICS = ("revenue", "aov", "median_amount", "refund_rate")
+OVERALL = "ALL"
+
+# Peak working memory of one (replicates x rows) tile, per worker
+MAX_BATCH_BYTES = 256 * 1024**2
+# Per (replicate, row) a tile holds the weights, their country-ordered copy and
+# one float64 scratch array for the median search, plus temporaries
+PER_CELL_BYTES = 40
+
+_DATA: dict | None = None
+
+
+def tile_shape(n_rows: int, n_boot: int, max_bytes: int | None = None) -> tuple[int, int]:
+    """(replicates, rows) per tile so one tile's peak stays under max_bytes.
+
+    The row tile length depends only on the data size and max_bytes, never on
+    how replicates are batched, so every replicate sees the same draws.
+    """
+    max_bytes = MAX_BATCH_BYTES if max_bytes is None else max_bytes
+    cells = max(1, max_bytes // PER_CELL_BYTES)
+    rows = int(min(max(n_rows, 1), cells))
+    size = int(min(n_boot, max(1, cells // rows)))
+    return size, rows
+
+
+def _prepare(df: pd.DataFrame, amount: str, status: str, group: str | None, rows: int) -> dict:
+    """Flatten the frame into NumPy arrays sorted once by amount, cut into row tiles.
+
+    Sale rows (non-refund, known amount) come first and in ascending order, so
+    the overall median is a forward scan. Each tile also gets a stable
+    country-ordered copy, built once: every country is one contiguous slice,
+    still in amount order, and its slices across tiles follow each other.
+    """
+    a = df[amount].to_numpy(dtype=np.float64, na_value=np.nan)
+    refund = df[status].eq("refund").fillna(False).to_numpy(dtype=bool) if status in df.columns else np.zeros(len(df), bool)
+    sale = ~refund & ~np.isnan(a)
+    if group is not None and group in df.columns:
+        codes, labels = pd.factorize(df[group], sort=True)
+    else:
+        codes, labels = np.full(len(df), -1), pd.Index([])
+
+    order = np.argsort(np.where(sale, a, np.inf), kind="stable")
+    a, sale, refund, codes = a[order], sale[order], refund[order], codes[order]
+    # Columns: revenue, sale count, refund count, order count
+    x = np.column_stack([np.where(sale, a, 0.0), sale, refund, np.ones(len(a))])
+
+    tiles = []
+    for start in range(0, len(a), rows):
+        end = min(start + rows, len(a))
+        perm = np.argsort(codes[start:end], kind="stable")
+        tiles.append(
+            {
+                "start": start,
+                "end": end,
+                "perm": perm,
+                # Country g is perm positions bounds[g]:bounds[g + 1]; missing countries sort first
+                "bounds": np.searchsorted(codes[start:end][perm], np.arange(len(labels) + 1)),
+                "x_by_country": x[start:end][perm],
+                "sale_by_country": sale[start:end][perm],
+                "a_by_country": a[start:end][perm],
+            }
+        )
+    return {
+        "a": a,
+        "x": x,
+        "sale": sale,
+        "tiles": tiles,
+        "labels": [str(v) for v in labels],
+        "n_sale": int(sale.sum()),
+    }
+
+
+def _weight_tiles(seeds: list[np.random.SeedSequence], tiles: list[dict], n: int, method: str):
+    """Yield a (replicates, rows) weight matrix per row tile.
+
+    Each replicate draws from its own generator, so the weights don't depend on
+    which other replicates share the tile, and the same seeds replay the same
+    weights. Multinomial draws are split across tiles with a binomial chain,
+    which is exactly a multinomial over all n rows.
+    """
+    gens = [np.random.default_rng(s) for s in seeds]
+    remaining = np.full(len(seeds), n, dtype=np.int64)
+    for t in tiles:
+        start, end = t["start"], t["end"]
+        m = end - start
+        if method == "ones":
+            yield np.ones((len(seeds), m))
+            continue
+        w = np.empty((len(seeds), m))
+        for r, rng in enumerate(gens):
+            if method == "poisson":
+                w[r] = rng.poisson(1.0, m)
+            elif method == "multinomial":
+                k = remaining[r] if end == n else rng.binomial(remaining[r], m / (n - start))
+                remaining[r] -= k
+                w[r] = rng.multinomial(k, np.full(m, 1.0 / m))
+            else:
+                raise ValueError(f"Unknown resampling method: {method!r}. Use 'poisson' or 'multinomial'.")
+        yield w
+
+
+def _first_reaching(c: np.ndarray, v: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per row r of `c`, the first columns where c[r] >= v[r, j] and where c[r] > v[r, j].
+
+    Rows of `c` are non-negative and non-decreasing. Offsetting each row by more
+    than its range turns all rows into one sorted array, so a single
+    searchsorted answers every query. Rows that never reach the value give c.shape[1].
+    """
+    size, m = c.shape
+    # Queries are clipped to top + 1, still past every value and below the next row
+    span = c[:, -1].max() + 2
+    off = np.arange(size)[:, None] * span
+    flat = (c + off).ravel()
+    q = np.clip(v, 0, span - 1) + off
+    row0 = np.arange(size)[:, None] * m
+    return np.searchsorted(flat, q, side="left") - row0, np.searchsorted(flat, q, side="right") - row0
+
+
+def _stats(seeds: list[np.random.SeedSequence], method: str, data: dict) -> np.ndarray:
+    """Metrics for one replicate per seed: shape (replicates, 1 + groups, len(METRICS)).
+
+    Pass 1 accumulates weighted sums tile by tile. Pass 2 replays the same
+    weights over the sale rows to find each weighted median: a running
+    cumulative weight per replicate and country, searched with searchsorted.
+    Tiles are only regenerated when the rows don't fit in one tile.
+    """
+    a, x, sale, tiles, n_sale = data["a"], data["x"], data["sale"], data["tiles"], data["n_sale"]
+    n, g1, size = len(a), 1 + len(data["labels"]), len(seeds)
+
+    sums = np.zeros((size, g1, 4))
+    cached = None
+    for t, w in zip(tiles, _weight_tiles(seeds, tiles, n, method)):
+        sums[:, 0] += w @ x[t["start"] : t["end"]]
+        wc = w[:, t["perm"]]
+        b = t["bounds"]
+        for g in range(g1 - 1):
+            if b[g + 1] > b[g]:
+                sums[:, g + 1] += wc[:, b[g] : b[g + 1]] @ t["x_by_country"][b[g] : b[g + 1]]
+        if len(tiles) == 1:
+            cached = w
+        del wc
+
+    half = sums[:, :, 1] / 2
+    lower = np.full((size, g1), np.nan)
+    upper = np.full((size, g1), np.nan)
+    # Groups without sales have no median; mark them done so the scan can stop early
+    lower[half == 0] = upper[half == 0] = 0.0
+    carry = np.zeros((size, g1))
+    weights = [cached] if cached is not None else _weight_tiles(seeds, tiles, n, method)
+    for t, w in zip(tiles, weights):
+        if t["start"] >= n_sale:
+            break
+        start, b = t["start"], t["bounds"]
+        # Sale weight only, so refunds and missing amounts never move the running total
+        wc = w[:, t["perm"]]
+        np.multiply(wc, t["sale_by_country"], out=wc)
+        np.cumsum(wc, axis=1, out=wc)
+        np.multiply(w, sale[start : t["end"]], out=w)
+        np.cumsum(w, axis=1, out=w)
+
+        # Cumulative weight just before each country's slice in this tile
+        before = np.where(b[:-1] > 0, wc[:, np.maximum(b[:-1] - 1, 0)], 0.0)
+        after = np.where(b[1:] > 0, wc[:, np.maximum(b[1:] - 1, 0)], 0.0)
+        searches = (
+            (w, 0.0, half[:, :1] - carry[:, :1], w.shape[1], a[start : t["end"]], 0),
+            (wc, before, half[:, 1:] - carry[:, 1:], b[1:], t["a_by_country"], 1),
+        )
+        # Midpoint of the lower (cum >= half) and upper (cum > half) crossings,
+        # which equals np.median for unit weights
+        for c, base, need, end, values, col in searches:
+            cols = slice(col, col + need.shape[1])
+            for out, pos in zip((lower, upper), _first_reaching(c, base + need)):
+                hit = np.isnan(out[:, cols]) & (pos < end)
+                out[:, cols][hit] = values[pos[hit]]
+        carry[:, 0] += w[:, -1]
+        carry[:, 1:] += after - before
+        if not (np.isnan(lower).any() or np.isnan(upper).any()):
+            break
+
+    out = np.empty((size, g1, len(METRICS)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[:, :, 0] = sums[:, :, 0]
+        out[:, :, 1] = sums[:, :, 0] / sums[:, :, 1]
+        out[:, :, 2] = np.where(sums[:, :, 1] > 0, (lower + upper) / 2, np.nan)
+        out[:, :, 3] = sums[:, :, 2] / sums[:, :, 3]
+    return out
+
+
+def _run_batch(job: tuple[list[np.random.SeedSequence], str], data: dict | None = None) -> np.ndarray:
+    seeds, method = job
+    return _stats(seeds, method, _DATA if data is None else data)
+
+
+def _init_worker(data: dict) -> None:
+    global _DATA
+    _DATA = data
+
+
+def bootstrap_ci(
+    df: pd.DataFrame,
+    *,
+    amount: str = "amount",
+    status: str = "status_clean",
+    group: str | None = "country",
+    n_boot: int = 1000,
+    ci: float = 0.95,
+    method: str = "poisson",
+    batch_size: int | None = None,
+    n_jobs: int = 1,
+    seed: int = 0,
+    max_bytes: int | None = None,
+) -> pd.DataFrame:
+    """Bootstrap confidence intervals for revenue, AOV, median amount and refund rate.
+
+    Metrics follow the summary definitions: revenue/AOV/median use non-refund
+    rows with a known amount, refund rate uses all orders. Resampling is done
+    with Poisson(1) or multinomial row weights in tiles of replicates x rows
+    sized by tile_shape, so each worker's peak stays near `max_bytes`
+    (default MAX_BATCH_BYTES, plus the prepared input arrays). `batch_size`
+    caps replicates per tile. Every replicate has its own child seed, so the
+    resamples are the same for any `n_jobs` or `batch_size` (Poisson ones also
+    for any `max_bytes`; the multinomial chain follows the row tiles).
+
+    Returns one row per (country, metric); the overall row uses country="ALL".
+    """
+    if method not in ("poisson", "multinomial"):
+        raise ValueError(f"Unknown resampling method: {method!r}. Use 'poisson' or 'multinomial'.")
+    if len(df) == 0 or n_boot <= 0:
+        raise ValueError("bootstrap_ci needs at least one row and n_boot > 0")
+
+    size, rows = tile_shape(len(df), n_boot, max_bytes)
+    if batch_size is not None:
+        size = max(1, min(size, batch_size))
+    if n_jobs > 1:
+        # At least one batch per worker
+        size = min(size, -(-n_boot // n_jobs))
+    data = _prepare(df, amount, status, group, rows)
+
+    seeds = np.random.SeedSequence(seed).spawn(n_boot)
+    jobs = [(seeds[i : i + size], method) for i in range(0, n_boot, size)]
+
+    if n_jobs == 1 or len(jobs) == 1:
+        reps = [_run_batch(job, data) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(data,)) as ex:
+            reps = list(ex.map(_run_batch, jobs))
+    reps = np.concatenate(reps, axis=0)
+
+    # Same code path with unit weights, so estimate and CI share one median definition
+    est = _stats([np.random.SeedSequence(seed)], "ones", data)[0]
+
+    alpha = (1 - ci) / 2
+    with warnings.catch_warnings():
+        # Groups with no sales give all-NaN AOV/median replicates
+        warnings.simplefilter("ignore", RuntimeWarning)
+        lo, hi = np.nanquantile(reps, [alpha, 1 - alpha], axis=0)
+
+    labels = [OVERALL] + data["labels"]
+    rows_out = [
+        {
+            "country": labels[g],
+            "metric": metric,
+            "estimate": float(est[g, k]),
+            "ci_low": float(lo[g, k]),
+            "ci_high": float(hi[g, k]),
+        }
+        for g in range(len(labels))
+        for k, metric in enumerate(METRICS)
+    ]
+    return pd.DataFrame(rows_out)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_NAT = np.iinfo(np.int64).min
+
+
+def _ts_ns(s: pd.Series) -> np.ndarray:
+    """Timestamps as int64 nanoseconds; NaT maps to int64 min so it never wins."""
+    idx = pd.DatetimeIndex(pd.to_datetime(s, errors="coerce", utc=True)).as_unit("ns")
+    return idx.asi8
+
+
+def latest_mask(keys: pd.Series, ts: pd.Series) -> np.ndarray:
+    """Boolean mask selecting the latest row per key, without sorting.
+
+    Keys are hash-factorized to dense codes, then the max timestamp per code is
+    found with a scatter-max. Ties (including all-NaT groups) keep the last row
+    in input order. Rows with a missing key are always kept.
+    """
+    codes, uniques = pd.factorize(keys, sort=False)
+    n_groups = len(uniques)
+    t = _ts_ns(ts)
+    has_key = codes >= 0
+
+    best = np.full(n_groups, _NAT, dtype=np.int64)
+    np.maximum.at(best, codes[has_key], t[has_key])
+
+    rows = np.arange(len(codes))
+    cand = has_key & (t == best[np.where(has_key, codes, 0)])
+    winner = np.full(n_groups, -1, dtype=np.int64)
+    np.maximum.at(winner, codes[cand], rows[cand])
+
+    keep = ~has_key
+    keep[winner[winner >= 0]] = True
+    return keep
+
+
+def dedup_latest(df: pd.DataFrame, key: str = "order_id", ts: str = "created_at") -> pd.DataFrame:
+    """Keep the latest record per key by timestamp (input order is preserved)."""
+    if len(df) == 0:
+        return df
+    return df.loc[latest_mask(df[key], df[ts])]
+
+
+def load_key_index(path: Path, key: str = "order_id", ts: str = "created_at") -> pd.DataFrame:
+    """Load the persisted key index (key -> latest timestamp seen); empty if missing.
+
+    Columns stored alongside the timestamps (e.g. metric contributions) are kept.
+    """
+    if path.exists():
+        return pd.read_parquet(path)
+    return pd.DataFrame(
+        {key: pd.Series(dtype="string"), ts: pd.Series(dtype="datetime64[ns, UTC]")}
+    )
+
+
+def match_index(
+    batch: pd.DataFrame,
+    index: pd.DataFrame,
+    key: str = "order_id",
+    ts: str = "created_at",
+) -> tuple[np.ndarray, np.ndarray]:
+    """Look up batch keys in a key index.
+
+    Returns each row's position in the index (-1 for unseen or missing keys)
+    and whether it is strictly newer than the indexed timestamp. The batch
+    keys are hashed and the index's key column is probed in one vectorized
+    pass; only the matching index rows are read.
+    """
+    rows = np.flatnonzero(index[key].isin(batch[key].dropna()).to_numpy())
+    local = pd.Index(index[key].iloc[rows]).get_indexer(batch[key])
+    seen = local >= 0
+    pos = np.full(len(batch), -1, dtype=np.int64)
+    pos[seen] = rows[local[seen]]
+    prev = np.full(len(batch), _NAT, dtype=np.int64)
+    prev[seen] = _ts_ns(index[ts].iloc[pos[seen]])
+    return pos, seen & (_ts_ns(batch[ts]) > prev)
+
+
+def upsert_index(index: pd.DataFrame, rows: pd.DataFrame, pos: np.ndarray) -> pd.DataFrame:
+    """Copy of the index with `rows` written at `pos`, and appended where pos is -1.
+
+    Only the index's own columns are written; dtypes are preserved. Replaced
+    rows only write values that changed, since writing into an Arrow-backed
+    string column rebuilds the whole column.
+    """
+    cols = [c for c in index.columns if c in rows.columns]
+    hit = pos >= 0
+    at = pos[hit]
+    out = index.copy()
+    for c in cols:
+        new = rows[c].array[hit]
+        changed = ~pd.Series(out[c].array[at]).eq(pd.Series(new)).fillna(False).to_numpy(dtype=bool)
+        if changed.any():
+            out.iloc[at[changed], out.columns.get_loc(c)] = new[changed]
+    added = rows.loc[~hit, cols].astype(index.dtypes[cols].to_dict())
+    if len(added) == 0:
+        return out.reset_index(drop=True)
+    return pd.concat([out, added], ignore_index=True) if len(out) else added.reset_index(drop=True)
+
+
+def dedup_incremental(
+    df: pd.DataFrame,
+    index: pd.DataFrame,
+    key: str = "order_id",
+    ts: str = "created_at",
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Dedup a new batch against previously processed keys.
+
+    Returns (rows to process, updated index). A row is kept if its key is new
+    or strictly newer than the indexed timestamp; replays of already-processed
+    records are dropped. Only the key index is read, never the history.
+    """
+    batch = dedup_latest(df, key=key, ts=ts)
+    pos, newer = match_index(batch, index, key, ts)
+    fresh = batch.loc[(pos < 0) | newer]
+
+    # Update known keys in place, append unseen ones
+    write = newer | ((pos < 0) & batch[key].notna().to_numpy())
+    new_index = upsert_index(index, batch.loc[write, [key, ts]], pos[write])
+    return fresh, new_index.astype({key: "string"})
+
+
+def write_key_index(index: pd.DataFrame, path: Path) -> None:
+    """Persist the key index (idempotent overwrite)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    index.to_parquet(path, index=False)
@@ -7,6 +7,11 @@ from pathlib import Path
 
 import pandas as pd
 
+from bootcamp_data.dedup import dedup_incremental, dedup_latest, load_key_index, write_key_index
+from bootcamp_data.io import read_orders_csv, read_users_csv
+from bootcamp_data.schema import apply_schema, bytes_per_row
+from bootcamp_data.timeseries import MetricsState, empty_state, load_state, update_state, write_state
+
 
 @dataclass(frozen=True)
 class ETLConfig:
@@ -17,124 +22,128 @@ class ETLConfig:
     out_users: Path
     out_analytics: Path
     run_meta: Path
+    # Set to dedup incrementally against previously processed order_ids
+    order_key_index: Path | None = None
+    # Set to maintain per-country day/week/month bucket metrics; with
+    # order_key_index also set, each order's contribution lives in the key index
+    metrics_state: Path | None = None
 
 
-def run_etl(cfg: ETLConfig) -> None:
-    cfg.out_orders_clean.parent.mkdir(parents=True, exist_ok=True)
+STATUS_MAP = {
+    "refunded": "refund",
+    "refund": "refund",
+    "returned": "refund",
+    "cancelled": "cancel",
+    "canceled": "cancel",
+}
 
-    orders = pd.read_csv(cfg.raw_orders)
-    users = pd.read_csv(cfg.raw_users)
 
-    orders.columns = [str(c).strip().lower() for c in orders.columns]
-    users.columns = [str(c).strip().lower() for c in users.columns]
+def clean_status(s: pd.Series) -> pd.Series:
+    """Normalize a categorical status column by mapping its categories, not its rows."""
+    s = s.astype("category")
+    cats = s.cat.categories
+    norm = cats.astype(str).str.strip().str.lower()
+    lookup = dict(zip(cats, (STATUS_MAP.get(c, c) for c in norm)))
+    return s.map(lookup).astype("category")
 
-    if "status" in orders.columns:
-        s = orders["status"].astype(str).str.strip().str.lower()
-        orders["status_clean"] = s.replace(
-            {
-                "refunded": "refund",
-                "refund": "refund",
-                "returned": "refund",
-                "cancelled": "cancel",
-                "canceled": "cancel",
-            }
-        )
 
-    for col in ("amount", "quantity"):
-        if col in orders.columns:
-            orders[col] = pd.to_numeric(orders[col], errors="coerce")
-            orders[f"{col}__isna"] = orders[col].isna()
+def batch_path(path: Path, run_id: str) -> Path:
+    """Partition file for one incremental batch: <stem>_batches/<run_id><suffix>."""
+    return path.parent / f"{path.stem}_batches" / f"{run_id}{path.suffix}"
 
-    orders.to_parquet(cfg.out_orders_clean, index=False)
-    users.to_parquet(cfg.out_users, index=False)
 
-    join_key = None
-    for k in ("user_id", "customer_id", "userid", "id"):
-        if k in orders.columns and k in users.columns:
-            join_key = k
-            break
+def _batch_files(path: Path) -> list[Path]:
+    """Batch partitions of `path` in run order (run ids sort chronologically)."""
+    return sorted(batch_path(path, "*").parent.glob(f"*{path.suffix}"))
 
-    if join_key is not None:
-        merged = orders.merge(users, on=join_key, how="left", suffixes=("", "_user"))
-    else:
-        merged = orders.copy()
 
-    refund_mask = merged["status_clean"].eq("refund") if "status_clean" in merged.columns else pd.Series(False, index=merged.index)
+def orders_clean_files(path: Path) -> list[Path]:
+    """The full-run file (if present) followed by its batch partitions."""
+    return ([path] if path.exists() else []) + _batch_files(path)
 
-    if "amount" in merged.columns:
-        merged["_net_amount"] = pd.to_numeric(merged["amount"], errors="coerce").fillna(0)
-        merged.loc[refund_mask, "_net_amount"] = 0
-    else:
-        merged["_net_amount"] = 0
-
-    if "country" in merged.columns:
-        analytics = (
-            merged.groupby("country", dropna=False)
-            .agg(orders=("country", "size"), revenue=("_net_amount", "sum"))
-            .reset_index()
-        )
-    else:
-        analytics = pd.DataFrame(
-            [
-                {
-                    "orders": int(len(merged)),
-                    "revenue": float(merged["_net_amount"].sum()),
-                }
-            ]
-        )
 
-    analytics.to_parquet(cfg.out_analytics, index=False)
+def read_orders_clean(path: Path) -> pd.DataFrame:
+    """Current cleaned orders: the full-run file plus any incremental batches.
 
-    meta = {
-        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
-        "row_counts": {
-            "orders_raw": int(len(orders)),
-            "users_raw": int(len(users)),
-            "orders_clean": int(len(orders)),
-            "users_clean": int(len(users)),
-            "analytics_table": int(len(analytics)),
-        },
-        "missing": {
-            "orders_raw": {c: int(orders[c].isna().sum()) for c in orders.columns},
-            "users_raw": {c: int(users[c].isna().sum()) for c in users.columns},
-        },
-    }
-    cfg.run_meta.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    The full-run file is the base and batch partitions are applied on top in
+    run order. Per order_id the latest created_at wins; on a tie the later file
+    wins, so a re-sent order shows up once with its newest values.
+    """
+    files = orders_clean_files(path)
+    if not files:
+        raise FileNotFoundError(f"No orders_clean file or batches at {path}")
+    parts = [apply_schema(pd.read_parquet(f), "orders") for f in files]
+    orders = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    if len(parts) > 1 and {"order_id", "created_at"} <= set(orders.columns):
+        orders = dedup_latest(orders).reset_index(drop=True)
+    # Categories differ between files; re-encode once over the union
+    return apply_schema(orders, "orders")
 
-def run_etl(cfg: ETLConfig) -> None:
-    import json
-    from datetime import datetime, timezone
 
-    import pandas as pd
+def compact_orders_clean(path: Path) -> None:
+    """Fold the batch partitions into the full-run file and remove them."""
+    batches = _batch_files(path)
+    if not batches:
+        return
+    orders = read_orders_clean(path)
+    tmp = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    orders.to_parquet(tmp, index=False)
+    tmp.replace(path)
+    for f in batches:
+        f.unlink()
 
-    cfg.out_orders_clean.parent.mkdir(parents=True, exist_ok=True)
 
-    orders = pd.read_csv(cfg.raw_orders)
-    users = pd.read_csv(cfg.raw_users)
+def _drop_batches(path: Path) -> None:
+    for f in _batch_files(path):
+        f.unlink()
 
-    orders.columns = [str(c).strip().lower() for c in orders.columns]
-    users.columns = [str(c).strip().lower() for c in users.columns]
+
+def run_etl(cfg: ETLConfig) -> None:
+    started = datetime.now(timezone.utc)
+    cfg.out_orders_clean.parent.mkdir(parents=True, exist_ok=True)
+
+    # Typed once at read time (see bootcamp_data.schema)
+    orders = read_orders_csv(cfg.raw_orders)
+    users = read_users_csv(cfg.raw_users)
 
     if "status" in orders.columns:
-        s = orders["status"].astype(str).str.strip().str.lower()
-        orders["status_clean"] = (
-            s.replace(
-                {
-                    "refunded": "refund",
-                    "refund": "refund",
-                    "returned": "refund",
-                    "cancelled": "cancel",
-                    "canceled": "cancel",
-                }
-            )
-        )
+        orders["status_clean"] = clean_status(orders["status"])
 
     for col in ("amount", "quantity"):
         if col in orders.columns:
-            orders[col] = pd.to_numeric(orders[col], errors="coerce")
             orders[f"{col}__isna"] = orders[col].isna()
 
-    orders.to_parquet(cfg.out_orders_clean, index=False)
+    # Replayed exports: keep the latest record per order_id
+    orders_raw_n = int(len(orders))
+    key_index = None
+    base_state: MetricsState | None = None
+    if {"order_id", "created_at"} <= set(orders.columns):
+        if cfg.order_key_index is not None:
+            if cfg.metrics_state is not None:
+                # One table serves as key index and per-order metrics, so it is read once
+                base_state = load_state(cfg.metrics_state, orders_path=cfg.order_key_index)
+                index = base_state.orders
+            else:
+                index = load_key_index(cfg.order_key_index)
+            orders, key_index = dedup_incremental(orders, index)
+        else:
+            orders = dedup_latest(orders)
+        orders = orders.reset_index(drop=True)
+
+    # Incremental runs only see the new batch: write it to its own partition so the
+    # full-run files are never overwritten by a batch (read both via read_orders_clean)
+    incremental = key_index is not None
+    run_id = started.strftime("%Y%m%dT%H%M%S%fZ")
+    out_orders = batch_path(cfg.out_orders_clean, run_id) if incremental else cfg.out_orders_clean
+    out_analytics = batch_path(cfg.out_analytics, run_id) if incremental else cfg.out_analytics
+    out_orders.parent.mkdir(parents=True, exist_ok=True)
+    out_analytics.parent.mkdir(parents=True, exist_ok=True)
+
+    orders.to_parquet(out_orders, index=False)
+    if not incremental:
+        # A full run reads the whole export, so it supersedes earlier batches
+        _drop_batches(cfg.out_orders_clean)
+        _drop_batches(cfg.out_analytics)
     users.to_parquet(cfg.out_users, index=False)
 
     join_keys = [k for k in ("user_id", "customer_id", "userid", "id") if k in orders.columns and k in users.columns]
@@ -146,6 +155,11 @@ def run_etl(cfg: ETLConfig) -> None:
         merged = orders.copy()
         unique_users = None
 
+    metrics_state = None
+    if cfg.metrics_state is not None and "created_at" in merged.columns:
+        # Incremental runs fold in only this batch; full runs rebuild from scratch
+        metrics_state = update_state(base_state if base_state is not None else empty_state(), merged)
+
     total_orders = int(len(orders))
 
     if "amount" in orders.columns:
@@ -166,16 +180,32 @@ def run_etl(cfg: ETLConfig) -> None:
             }
         ]
     )
-    analytics.to_parquet(cfg.out_analytics, index=False)
+    analytics.to_parquet(out_analytics, index=False)
 
     meta = {
-        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "timestamp_utc": started.isoformat(),
+        # "batch": orders_clean/analytics cover only this run's new rows
+        "scope": "batch" if incremental else "full",
+        "outputs": {
+            "orders_clean": str(out_orders),
+            "users": str(cfg.out_users),
+            "analytics": str(out_analytics),
+        },
         "row_counts": {
-            "orders_raw": int(len(orders)),
+            "orders_raw": orders_raw_n,
             "users_raw": int(len(users)),
             "orders_clean": int(len(orders)),
             "analytics_table": int(len(analytics)),
         },
+        "dedup": {
+            "key": "order_id",
+            "incremental": incremental,
+            "rows_dropped": orders_raw_n - int(len(orders)),
+        },
+        "bytes_per_row": {
+            "orders_clean": bytes_per_row(orders),
+            "users_clean": bytes_per_row(users),
+        },
         "missing": {
             "orders_raw": {c: int(orders[c].isna().sum()) for c in orders.columns},
             "users_raw": {c: int(users[c].isna().sum()) for c in users.columns},
@@ -183,3 +213,11 @@ def run_etl(cfg: ETLConfig) -> None:
     }
     cfg.run_meta.parent.mkdir(parents=True, exist_ok=True)
     cfg.run_meta.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    # Persist incremental state only after all outputs are written
+    if metrics_state is not None:
+        # Incremental: the per-order table is the key index (same keys and
+        # timestamps as key_index, plus the contributions)
+        write_state(metrics_state, cfg.metrics_state, orders_path=cfg.order_key_index if incremental else None)
+    elif key_index is not None:
+        write_key_index(key_index, cfg.order_key_index)
@@ -1,26 +1,33 @@
 from pathlib import Path
 import pandas as pd
 
+from bootcamp_data.schema import apply_schema, csv_dtypes
+
 # Centralized missing-value markers
 NA = ["", "NA", "N/A", "null", "None"]
 
+def _normalize_column(c) -> str:
+    return str(c).strip().lower()
+
+def read_typed_csv(path: Path, table: str) -> pd.DataFrame:
+    """Read a CSV and cast it to the registered schema in one pass.
+
+    Headers are normalized (stripped, lowercased) before matching the schema.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = csv_dtypes(table)
+    dtype = {c: wanted[_normalize_column(c)] for c in header if _normalize_column(c) in wanted}
+    df = pd.read_csv(path, dtype=dtype, na_values=NA, keep_default_na=True)
+    df.columns = [_normalize_column(c) for c in df.columns]
+    return apply_schema(df, table)
+
 def read_orders_csv(path: Path) -> pd.DataFrame:
-    """Read orders CSV with safe dtypes (IDs as strings)."""
-    return pd.read_csv(
-        path,
-        dtype={"order_id": "string", "user_id": "string"},
-        na_values=NA,
-        keep_default_na=True,
-    )
+    """Read orders CSV with the orders schema applied."""
+    return read_typed_csv(path, "orders")
 
 def read_users_csv(path: Path) -> pd.DataFrame:
-    """Read users CSV with safe dtypes (IDs as strings)."""
-    return pd.read_csv(
-        path,
-        dtype={"user_id": "string"},
-        na_values=NA,
-        keep_default_na=True,
-    )
+    """Read users CSV with the users schema applied."""
+    return read_typed_csv(path, "users")
 
 def write_parquet(df: pd.DataFrame, path: Path) -> None:
     """Write a DataFrame to Parquet (idempotent overwrite)."""
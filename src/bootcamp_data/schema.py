@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Narrowest storage type per column, keyed by table name.
+# - repeated labels/IDs are dictionary-encoded ("category")
+# - order_id is unique per row, so a category would only add codes on top of the strings
+# - nullable Int8/Int16 keep NA for time parts and quantities parsed from bad input
+# - money stays float64: float32 loses whole cents above ~$83k and drifts in sums
+ORDERS: dict[str, str] = {
+    "order_id": "string",
+    "user_id": "category",
+    "amount": "float64",
+    "quantity": "Int16",
+    "created_at": "datetime64[ns, UTC]",
+    "status": "category",
+    "status_clean": "category",
+    "amount__isna": "bool",
+    "quantity__isna": "bool",
+}
+
+USERS: dict[str, str] = {
+    "user_id": "category",
+    "country": "category",
+    "signup_date": "datetime64[ns]",
+}
+
+ANALYTICS: dict[str, str] = {
+    **ORDERS,
+    **{k: v for k, v in USERS.items() if k != "user_id"},
+    "year": "Int16",
+    "month": "Int8",
+    "day": "Int8",
+    "hour": "Int8",
+    "weekday": "Int8",
+    "date_only": "datetime64[ns, UTC]",
+    "amount_winsor": "float64",
+    "amount__is_outlier": "bool",
+}
+
+SCHEMAS: dict[str, dict[str, str]] = {
+    "orders": ORDERS,
+    "users": USERS,
+    "analytics": ANALYTICS,
+}
+
+_NUMERIC = {"float64", "Int8", "Int16"}
+_INTEGER = {"Int8", "Int16"}
+
+
+def get_schema(table: str) -> dict[str, str]:
+    """Return the column -> dtype mapping registered for a table."""
+    if table not in SCHEMAS:
+        raise ValueError(f"Unknown schema: {table!r}. Known: {sorted(SCHEMAS)}")
+    return SCHEMAS[table]
+
+
+def csv_dtypes(table: str) -> dict[str, str]:
+    """Dtypes that read_csv can apply while parsing (labels and IDs only).
+
+    Numeric and datetime columns are left out so malformed values get coerced
+    to NA by apply_schema instead of failing the read.
+    """
+    return {c: t for c, t in get_schema(table).items() if t in ("string", "category")}
+
+
+def is_utc(s: pd.Series) -> bool:
+    """True for a tz-aware datetime column whose timezone is UTC."""
+    return isinstance(s.dtype, pd.DatetimeTZDtype) and str(s.dtype.tz) == "UTC"
+
+
+def _matches(s: pd.Series, target: str) -> bool:
+    # Exact match: other timezones or resolutions still need converting
+    return str(s.dtype) == target
+
+
+def _cast(s: pd.Series, target: str) -> pd.Series:
+    if target.startswith("datetime64"):
+        # to_datetime infers the resolution from the input; pin the registered one
+        return pd.to_datetime(s, errors="coerce", utc="UTC" in target).astype(target)
+    if target in _NUMERIC:
+        x = s if pd.api.types.is_numeric_dtype(s) else pd.to_numeric(s, errors="coerce")
+        if target in _INTEGER:
+            # Non-integral or out-of-range values are bad input, same as unparseable text
+            info = np.iinfo(target.lower())
+            x = x.where((x.round() == x) & x.between(info.min, info.max))
+        return x.astype(target)
+    if target == "bool":
+        return s.fillna(False).astype(bool)
+    return s.astype(target)
+
+
+def apply_schema(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Cast columns to their registered dtypes.
+
+    Columns that already have the target dtype are left untouched, so calling
+    this on data that was typed at read time (or round-tripped via Parquet)
+    is a no-op. Columns not in the schema are kept as-is.
+    """
+    for col, target in get_schema(table).items():
+        if col in df.columns and not _matches(df[col], target):
+            df[col] = _cast(df[col], target)
+    return df
+
+
+def bytes_per_row(df: pd.DataFrame) -> float:
+    """Deep memory usage per row, for comparing storage layouts."""
+    if len(df) == 0:
+        return 0.0
+    return float(df.memory_usage(deep=True, index=False).sum() / len(df))
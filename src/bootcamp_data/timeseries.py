@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bootcamp_data.dedup import dedup_latest, match_index, upsert_index
+
+GRAINS = ("day", "week", "month")
+
+_NS_PER_DAY = 86_400 * 10**9
+# 1970-01-01 is a Thursday; shifting by 3 days makes weeks start on Monday
+_WEEK_SHIFT = 3
+
+STATE_COLUMNS = ["grain", "bucket", "country", "orders", "refunds", "revenue"]
+# Per-order store: the key index columns plus the contribution last counted.
+# day is NA for orders without a valid timestamp (they add nothing).
+ORDER_DTYPES = {
+    "order_id": "string",
+    "created_at": "datetime64[ns, UTC]",
+    "day": "Int64",
+    "country": "string",
+    "refund": "bool",
+    "revenue": "float64",
+}
+
+
+def _epoch_days(ts: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Whole UTC days since 1970-01-01 plus a validity mask (NaT -> invalid)."""
+    idx = pd.DatetimeIndex(pd.to_datetime(ts, errors="coerce", utc=True)).as_unit("ns")
+    ns = idx.asi8
+    valid = ~idx.isna()
+    return np.floor_divide(ns, _NS_PER_DAY), valid
+
+
+def _month_index(days: np.ndarray) -> np.ndarray:
+    """Months since 1970-01 from epoch days (Hinnant's civil_from_days, vectorized)."""
+    z = days + 719_468
+    era = np.floor_divide(z, 146_097)
+    doe = z - era * 146_097
+    yoe = (doe - doe // 1_460 + doe // 36_524 - doe // 146_096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    month = np.where(mp < 10, mp + 3, mp - 9)
+    year = yoe + era * 400 + (month <= 2)
+    return (year - 1970) * 12 + (month - 1)
+
+
+def _bucket_days(days: np.ndarray, grain: str) -> np.ndarray:
+    if grain == "day":
+        return days
+    if grain == "week":
+        return np.floor_divide(days + _WEEK_SHIFT, 7)
+    if grain == "month":
+        return _month_index(days)
+    raise ValueError(f"Unknown grain: {grain!r}. Use one of {GRAINS}")
+
+
+def bucket(ts: pd.Series, grain: str = "day") -> tuple[np.ndarray, np.ndarray]:
+    """Integer bucket ids for timestamps, computed without building Period/str objects.
+
+    Returns (bucket ids, validity mask); ids for NaT rows are meaningless.
+    """
+    days, valid = _epoch_days(ts)
+    return _bucket_days(days, grain), valid
+
+
+def bucket_start(ids, grain: str = "day") -> pd.DatetimeIndex:
+    """First UTC timestamp of each bucket id."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if grain == "day":
+        days = ids
+    elif grain == "week":
+        days = ids * 7 - _WEEK_SHIFT
+    elif grain == "month":
+        years, months = np.divmod(ids, 12)
+        return pd.to_datetime(
+            pd.DataFrame({"year": years + 1970, "month": months + 1, "day": 1}), utc=True
+        ).pipe(pd.DatetimeIndex)
+    else:
+        raise ValueError(f"Unknown grain: {grain!r}. Use one of {GRAINS}")
+    return pd.to_datetime(days * _NS_PER_DAY, unit="ns", utc=True)
+
+
+def bucket_label(ids, grain: str = "month") -> list[str]:
+    """Readable labels: YYYY-MM for months, YYYY-MM-DD (bucket start) otherwise."""
+    fmt = "%Y-%m" if grain == "month" else "%Y-%m-%d"
+    return list(bucket_start(ids, grain).strftime(fmt))
+
+
+@dataclass(frozen=True)
+class MetricsState:
+    """Bucket totals plus each order's last counted contribution.
+
+    The per-order table is keyed by order_id and has the key index layout
+    (order_id, created_at) plus the contribution columns. It lets a re-sent
+    order retract what it added before, so an updated order is counted once
+    with its latest values.
+    """
+
+    buckets: pd.DataFrame
+    orders: pd.DataFrame
+
+
+def contributions(
+    df: pd.DataFrame,
+    *,
+    key: str = "order_id",
+    ts: str = "created_at",
+    group: str = "country",
+    amount: str = "amount",
+    status: str = "status_clean",
+) -> pd.DataFrame:
+    """What each order adds to the buckets: epoch day, country, refund flag, net revenue.
+
+    Revenue excludes refunds, matching the summary definitions. Rows without a
+    valid timestamp add nothing; they are kept with day NA so the per-order
+    table still records them.
+    """
+    n = len(df)
+    refund = df[status].eq("refund").fillna(False).to_numpy(dtype=bool) if status in df.columns else np.zeros(n, bool)
+    net = df[amount].to_numpy(dtype=np.float64, na_value=np.nan) if amount in df.columns else np.zeros(n)
+    net = np.where(refund | np.isnan(net), 0.0, net)
+    country = df[group].astype("string").to_numpy() if group in df.columns else np.full(n, pd.NA)
+    keys = df[key].astype("string").to_numpy() if key in df.columns else np.full(n, pd.NA)
+    created = pd.to_datetime(df[ts], errors="coerce", utc=True)
+    days, valid = _epoch_days(created)
+    day = pd.array(days, dtype="Int64")
+    day[~valid] = pd.NA
+    out = pd.DataFrame(
+        {
+            "order_id": keys,
+            "created_at": created.array,
+            "day": day,
+            "country": country,
+            "refund": refund,
+            "revenue": net,
+        }
+    )
+    return out.astype(ORDER_DTYPES)
+
+
+def _aggregate(contrib: pd.DataFrame, sign: int = 1) -> pd.DataFrame:
+    contrib = contrib[contrib["day"].notna()]
+    days = contrib["day"].to_numpy(dtype=np.int64)
+    parts = []
+    for grain in GRAINS:
+        frame = pd.DataFrame(
+            {
+                "bucket": _bucket_days(days, grain),
+                "country": contrib["country"].to_numpy(),
+                "orders": np.full(len(contrib), sign, dtype=np.int64),
+                "refunds": contrib["refund"].to_numpy(dtype=np.int64) * sign,
+                "revenue": contrib["revenue"].to_numpy(dtype=np.float64) * sign,
+            }
+        )
+        agg = frame.groupby(["bucket", "country"], dropna=False, sort=False).sum().reset_index()
+        agg.insert(0, "grain", grain)
+        parts.append(agg)
+    return _normalize(pd.concat(parts, ignore_index=True))
+
+
+def aggregate(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    """Per (grain, bucket, country) order count, refund count and net revenue."""
+    return _aggregate(contributions(df, **kwargs))
+
+
+def _normalize(buckets: pd.DataFrame) -> pd.DataFrame:
+    return buckets.astype(
+        {"grain": "category", "bucket": "int64", "country": "string", "orders": "int64", "refunds": "int64", "revenue": "float64"}
+    )[STATE_COLUMNS]
+
+
+def empty_state() -> MetricsState:
+    return MetricsState(
+        buckets=_normalize(pd.DataFrame({c: [] for c in STATE_COLUMNS})),
+        orders=pd.DataFrame({c: [] for c in ORDER_DTYPES}).astype(ORDER_DTYPES),
+    )
+
+
+def _order_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-order store with ORDER_DTYPES; a plain key index gets empty contributions."""
+    missing = {c: pd.NA for c in ORDER_DTYPES if c not in df.columns}
+    return df.assign(**missing)[list(ORDER_DTYPES)].astype(ORDER_DTYPES)
+
+
+def _merge_buckets(buckets: pd.DataFrame, *deltas: pd.DataFrame) -> pd.DataFrame:
+    parts = [f for f in (buckets, *deltas) if len(f)]
+    if not parts:
+        return buckets
+    merged = pd.concat(parts, ignore_index=True)
+    out = (
+        merged.groupby(["grain", "bucket", "country"], dropna=False, sort=False, observed=True)[["orders", "refunds", "revenue"]]
+        .sum()
+        .reset_index()
+    )
+    # Buckets emptied by retractions would otherwise linger with float residue
+    return _normalize(out[out["orders"] != 0].reset_index(drop=True))
+
+
+def update_state(state: MetricsState, new_rows: pd.DataFrame, *, key: str = "order_id", ts: str = "created_at", **kwargs) -> MetricsState:
+    """Fold a batch of new or updated orders into the state.
+
+    Only the batch's order_ids are looked up in the per-order table. A
+    version with a later created_at than the stored one replaces it: the
+    stored contribution is subtracted before the new one is added. Versions
+    that are not newer (late or repeated re-sends) are ignored. Bucket totals
+    are recomputed only for the buckets the batch touches (the table holds
+    one row per bucket and country).
+    """
+    if key in new_rows.columns and ts in new_rows.columns:
+        new_rows = dedup_latest(new_rows, key=key, ts=ts)
+    new = contributions(new_rows, key=key, ts=ts, **kwargs)
+
+    pos, newer = match_index(new, state.orders)
+    take = (pos < 0) | newer
+    old = state.orders.iloc[pos[newer]]
+    buckets = _merge_buckets(state.buckets, _aggregate(new[take]), _aggregate(old, sign=-1))
+
+    store = take & new["order_id"].notna().to_numpy()
+    orders = upsert_index(state.orders, new[store], pos[store])
+    return MetricsState(buckets=buckets, orders=orders)
+
+
+def _orders_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}_orders{path.suffix}")
+
+
+def load_state(path: Path, orders_path: Path | None = None) -> MetricsState:
+    """Load persisted state; missing files load as empty.
+
+    Buckets are read from `path` and the per-order table from `orders_path`
+    (default: next to `path`). Passing the order key index as `orders_path`
+    keeps contributions in the index the incremental dedup reads anyway.
+    """
+    orders_path = _orders_path(path) if orders_path is None else orders_path
+    empty = empty_state()
+    buckets = _normalize(pd.read_parquet(path)) if path.exists() else empty.buckets
+    orders = _order_table(pd.read_parquet(orders_path)) if orders_path.exists() else empty.orders
+    return MetricsState(buckets=buckets, orders=orders)
+
+
+def write_state(state: MetricsState, path: Path, orders_path: Path | None = None) -> None:
+    """Persist state (idempotent overwrite); see load_state for `orders_path`."""
+    orders_path = _orders_path(path) if orders_path is None else orders_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    orders_path.parent.mkdir(parents=True, exist_ok=True)
+    state.buckets.to_parquet(path, index=False)
+    state.orders.to_parquet(orders_path, index=False)
+
+
+def rolling_metrics(state: MetricsState, grain: str = "day", window: int = 7) -> pd.DataFrame:
+    """Trailing `window`-bucket revenue, orders and refund rate per country.
+
+    Computed from the bucket state only (never the order rows). Empty buckets
+    count as zero, so a 7-day window always spans 7 calendar days.
+    """
+    s = state.buckets[state.buckets["grain"] == grain]
+    cols = ["bucket_start", "country", "orders", "refunds", "revenue", "refund_rate"]
+    if len(s) == 0:
+        return pd.DataFrame(columns=cols)
+
+    wide = s.pivot_table(
+        index="bucket", columns="country", values=["orders", "refunds", "revenue"], aggfunc="sum", fill_value=0, dropna=False
+    )
+    full = range(int(s["bucket"].min()), int(s["bucket"].max()) + 1)
+    rolled = wide.reindex(full, fill_value=0).rolling(window, min_periods=1).sum()
+
+    out = rolled.stack("country", future_stack=True).reset_index()
+    out = out[out["orders"] > 0].copy()
+    out["refund_rate"] = out["refunds"] / out["orders"]
+    out["orders"] = out["orders"].astype("int64")
+    out["refunds"] = out["refunds"].astype("int64")
+    out["bucket_start"] = bucket_start(out["bucket"].to_numpy(), grain)
+    return out[cols].reset_index(drop=True)
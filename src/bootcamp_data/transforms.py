@@ -1,23 +1,25 @@
 import pandas as pd
 
+from bootcamp_data.schema import ANALYTICS, apply_schema, is_utc
+
 def enforce_schema(df):
-    df["order_id"] = df["order_id"].astype("string")
-    df["user_id"] = df["user_id"].astype("string")
-    df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
-    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce")
-    return df
+    # No-op for frames read via bootcamp_data.io (already typed)
+    return apply_schema(df, "orders")
 
 def parse_datetime(df, col="created_at"):
-    df[col] = pd.to_datetime(df[col], errors="coerce", utc=True)
+    if not is_utc(df[col]):
+        df[col] = pd.to_datetime(df[col], errors="coerce", utc=True)
     return df
 
 def add_time_parts(df, col="created_at"):
-    df["year"] = df[col].dt.year
-    df["month"] = df[col].dt.month
-    df["day"] = df[col].dt.day
-    df["hour"] = df[col].dt.hour
-    df["weekday"] = df[col].dt.weekday
-    df["date_only"] = df[col].dt.date
+    dt = df[col].dt
+    df["year"] = dt.year.astype(ANALYTICS["year"])
+    df["month"] = dt.month.astype(ANALYTICS["month"])
+    df["day"] = dt.day.astype(ANALYTICS["day"])
+    df["hour"] = dt.hour.astype(ANALYTICS["hour"])
+    df["weekday"] = dt.weekday.astype(ANALYTICS["weekday"])
+    # Midnight timestamp instead of a Python date object per row
+    df["date_only"] = dt.normalize()
     return df
 
 def iqr_bounds(s, k=1.5):
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bootcamp_data.bootstrap import _prepare, _stats, _weight_tiles, bootstrap_ci
+
+
+def _orders(n=3_000, seed=1):
+    rng = np.random.default_rng(seed)
+    amount = np.round(rng.lognormal(3, 1, n), 2)
+    amount[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame(
+        {
+            "amount": amount,
+            "status_clean": rng.choice(["paid", "refund"], n, p=[0.9, 0.1]),
+            "country": rng.choice(["AE", "EG", "SA"], n),
+        }
+    )
+
+
+def _metric(cis, country, metric, col="estimate"):
+    return cis.set_index(["country", "metric"]).loc[(country, metric), col]
+
+
+def test_estimates_match_plain_pandas():
+    df = _orders()
+    cis = bootstrap_ci(df, n_boot=20)
+    sales = df[(df["status_clean"] != "refund") & df["amount"].notna()]
+
+    for country, rows, sold in [("ALL", df, sales)] + [(c, df[df["country"] == c], s) for c, s in sales.groupby("country")]:
+        assert _metric(cis, country, "revenue") == pytest.approx(sold["amount"].sum())
+        assert _metric(cis, country, "aov") == pytest.approx(sold["amount"].mean())
+        assert _metric(cis, country, "median_amount") == np.median(sold["amount"])
+        assert _metric(cis, country, "refund_rate") == pytest.approx((rows["status_clean"] == "refund").mean())
+        assert _metric(cis, country, "revenue", "ci_low") <= _metric(cis, country, "revenue", "ci_high")
+
+
+def test_even_count_median_is_midpoint():
+    df = pd.DataFrame({"amount": [1.0, 2.0, 10.0, 20.0], "status_clean": "paid", "country": "SA"})
+    assert _metric(bootstrap_ci(df, n_boot=5), "SA", "median_amount") == 6.0
+
+
+@pytest.mark.parametrize("method", ["poisson", "multinomial"])
+def test_results_do_not_depend_on_batching_or_workers(method):
+    df = _orders()
+    base = bootstrap_ci(df, n_boot=24, method=method)
+    for kwargs in ({"batch_size": 5}, {"n_jobs": 2}, {"n_jobs": 2, "batch_size": 7}):
+        other = bootstrap_ci(df, n_boot=24, method=method, **kwargs)
+        # Same resamples; only BLAS summation order may differ in the last bit
+        np.testing.assert_allclose(other.iloc[:, 2:], base.iloc[:, 2:], rtol=1e-12)
+
+
+@pytest.mark.parametrize("method", ["ones", "poisson"])
+def test_multi_tile_replay_matches_single_tile(method):
+    df = _orders()
+    seeds = np.random.SeedSequence(0).spawn(4)
+    single = _stats(seeds, method, _prepare(df, "amount", "status_clean", "country", len(df)))
+    # 128-row tiles: the median pass regenerates the weights instead of reusing them
+    tiled = _stats(seeds, method, _prepare(df, "amount", "status_clean", "country", 128))
+    np.testing.assert_allclose(tiled, single, rtol=1e-12)
+
+
+def test_small_max_bytes_keeps_estimates_exact():
+    df = _orders()
+    cis = bootstrap_ci(df, n_boot=8, method="multinomial", max_bytes=40 * 128)
+    sales = df[(df["status_clean"] != "refund") & df["amount"].notna()]
+    assert _metric(cis, "ALL", "median_amount") == np.median(sales["amount"])
+    assert _metric(cis, "SA", "median_amount") == np.median(sales.loc[sales["country"] == "SA", "amount"])
+
+
+def test_country_without_sales_has_no_median():
+    df = _orders(300)
+    extra = pd.DataFrame({"amount": [5.0, np.nan], "status_clean": ["refund", "paid"], "country": ["QA", "QA"]})
+    cis = bootstrap_ci(pd.concat([df, extra], ignore_index=True), n_boot=10)
+
+    assert _metric(cis, "QA", "revenue") == 0.0
+    assert _metric(cis, "QA", "refund_rate") == 0.5
+    for metric in ("aov", "median_amount"):
+        row = cis.set_index(["country", "metric"]).loc[("QA", metric)]
+        assert row.isna().all()
+
+
+def test_multinomial_chain_draws_exactly_n_rows():
+    df = _orders(1_000)
+    data = _prepare(df, "amount", "status_clean", "country", 64)
+    seeds = np.random.SeedSequence(3).spawn(200)
+    w = np.concatenate(list(_weight_tiles(seeds, data["tiles"], len(df), "multinomial")), axis=1)
+
+    assert (w.sum(axis=1) == len(df)).all()
+    # Each row is drawn Binomial(n, 1/n) times: mean 1, variance 1 - 1/n
+    assert w.mean() == pytest.approx(1.0)
+    assert w.var() == pytest.approx(1 - 1 / len(df), rel=0.02)
+    # Tiles are not systematically over- or under-filled by the chain
+    tile_means = [w[:, t["start"] : t["end"]].mean() for t in data["tiles"]]
+    assert np.allclose(tile_means, 1.0, atol=0.05)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        bootstrap_ci(_orders(10), n_boot=2, method="jackknife")
@@ -0,0 +1,77 @@
+import pandas as pd
+
+from bootcamp_data.dedup import dedup_incremental, latest_mask, load_key_index, write_key_index
+
+
+def _ts(values):
+    return pd.Series(pd.to_datetime(values, utc=True))
+
+
+def _batch(rows):
+    df = pd.DataFrame(rows, columns=["order_id", "created_at", "amount"])
+    df["order_id"] = df["order_id"].astype("string")
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+    return df
+
+
+def test_latest_mask_keeps_latest_per_key():
+    keys = pd.Series(["A", "B", "A", "B"])
+    ts = _ts(["2025-12-02", "2025-12-01", "2025-12-01", "2025-12-03"])
+    assert latest_mask(keys, ts).tolist() == [True, False, False, True]
+
+
+def test_latest_mask_ties_keep_last_row():
+    keys = pd.Series(["A", "A", "A"])
+    ts = _ts(["2025-12-01", "2025-12-02", "2025-12-02"])
+    assert latest_mask(keys, ts).tolist() == [False, False, True]
+
+
+def test_latest_mask_nat_never_beats_a_timestamp_and_all_nat_keeps_last():
+    keys = pd.Series(["A", "A", "B", "B"])
+    ts = _ts([None, "2025-12-01", None, None])
+    assert latest_mask(keys, ts).tolist() == [False, True, False, True]
+
+
+def test_latest_mask_keeps_rows_without_key():
+    keys = pd.Series(["A", None, None, "A"], dtype="string")
+    ts = _ts(["2025-12-02", "2025-12-01", "2025-12-01", "2025-12-01"])
+    assert latest_mask(keys, ts).tolist() == [True, True, True, False]
+
+
+def test_dedup_incremental_equal_newer_and_older_replays(tmp_path):
+    index = load_key_index(tmp_path / "keys.parquet")
+    first = _batch([("A1", "2025-12-02", 1.0), ("A2", "2025-12-02", 2.0), ("A3", "2025-12-02", 3.0)])
+    fresh, index = dedup_incremental(first, index)
+    assert fresh["order_id"].tolist() == ["A1", "A2", "A3"]
+
+    replay = _batch(
+        [
+            ("A1", "2025-12-02", 1.5),  # same timestamp: already processed
+            ("A2", "2025-12-03", 2.5),  # newer: reprocessed
+            ("A3", "2025-12-01", 3.5),  # older: ignored
+            ("A4", "2025-12-01", 4.0),  # unseen
+        ]
+    )
+    fresh, index = dedup_incremental(replay, index)
+    assert fresh["order_id"].tolist() == ["A2", "A4"]
+
+    latest = index.set_index("order_id")["created_at"]
+    assert len(latest) == 4
+    assert latest["A2"] == pd.Timestamp("2025-12-03", tz="UTC")
+    assert latest["A3"] == pd.Timestamp("2025-12-02", tz="UTC")
+
+
+def test_key_index_round_trip(tmp_path):
+    path = tmp_path / "keys.parquet"
+    empty = load_key_index(path)
+    assert len(empty) == 0
+
+    _, index = dedup_incremental(_batch([("A1", "2025-12-01", 1.0), ("A2", "2025-12-02", 2.0)]), empty)
+    write_key_index(index, path)
+    back = load_key_index(path)
+    pd.testing.assert_frame_equal(back, index)
+
+    # Replaying the same batch against the loaded index processes nothing
+    fresh, again = dedup_incremental(_batch([("A1", "2025-12-01", 1.0), ("A2", "2025-12-02", 2.0)]), back)
+    assert len(fresh) == 0
+    pd.testing.assert_frame_equal(again, index)
@@ -0,0 +1,74 @@
+import pandas as pd
+
+from bootcamp_data.etl import ETLConfig, compact_orders_clean, orders_clean_files, read_orders_clean, run_etl
+from bootcamp_data.timeseries import load_state
+
+HEADER = "order_id,user_id,amount,quantity,created_at,status\n"
+
+
+def _config(tmp_path, incremental=True, metrics=False):
+    (tmp_path / "users.csv").write_text("user_id,country,signup_date\n0001,SA,2025-11-01\n")
+    processed = tmp_path / "processed"
+    return ETLConfig(
+        root=tmp_path,
+        raw_orders=tmp_path / "orders.csv",
+        raw_users=tmp_path / "users.csv",
+        out_orders_clean=processed / "orders_clean.parquet",
+        out_users=processed / "users.parquet",
+        out_analytics=processed / "analytics_table.parquet",
+        run_meta=processed / "_run_meta.json",
+        order_key_index=processed / "order_keys.parquet" if incremental else None,
+        metrics_state=processed / "metrics.parquet" if metrics else None,
+    )
+
+
+def _run(cfg, rows):
+    cfg.raw_orders.write_text(HEADER + "".join(f"{r}\n" for r in rows))
+    run_etl(cfg)
+
+
+def test_resent_order_is_read_once_with_latest_values(tmp_path):
+    cfg = _config(tmp_path)
+    _run(cfg, ["A0001,0001,10.00,1,2025-12-01T10:00:00Z,paid", "A0002,0001,5.00,1,2025-12-01T11:00:00Z,paid"])
+    _run(cfg, ["A0001,0001,10.00,1,2025-12-02T10:00:00Z,refunded"])
+
+    assert len(orders_clean_files(cfg.out_orders_clean)) == 2
+    orders = read_orders_clean(cfg.out_orders_clean).set_index("order_id")
+    assert sorted(orders.index) == ["A0001", "A0002"]
+    assert orders.loc["A0001", "status_clean"] == "refund"
+
+    compact_orders_clean(cfg.out_orders_clean)
+    assert orders_clean_files(cfg.out_orders_clean) == [cfg.out_orders_clean]
+    compacted = read_orders_clean(cfg.out_orders_clean).set_index("order_id")
+    pd.testing.assert_frame_equal(compacted.sort_index(), orders.sort_index())
+
+
+def test_batches_apply_on_top_of_full_run_and_full_run_supersedes_them(tmp_path):
+    full = _config(tmp_path, incremental=False)
+    _run(full, ["A0001,0001,10.00,1,2025-12-01T10:00:00Z,paid"])
+
+    cfg = _config(tmp_path)
+    _run(cfg, ["A0001,0001,12.00,1,2025-12-02T10:00:00Z,paid"])
+    orders = read_orders_clean(cfg.out_orders_clean)
+    assert orders["amount"].tolist() == [12.0]
+
+    # A full run reads the whole export again, so earlier batches no longer apply
+    _run(full, ["A0001,0001,10.00,1,2025-12-01T10:00:00Z,paid"])
+    assert orders_clean_files(cfg.out_orders_clean) == [cfg.out_orders_clean]
+    assert read_orders_clean(cfg.out_orders_clean)["amount"].tolist() == [10.0]
+
+
+def test_incremental_metrics_keep_contributions_in_the_key_index(tmp_path):
+    cfg = _config(tmp_path, metrics=True)
+    _run(cfg, ["A0001,0001,10.00,1,2025-12-01T10:00:00Z,paid", "A0002,0001,5.00,1,2025-12-01T11:00:00Z,paid"])
+    _run(cfg, ["A0001,0001,10.00,1,2025-12-02T10:00:00Z,refunded"])
+
+    index = pd.read_parquet(cfg.order_key_index).set_index("order_id")
+    assert {"created_at", "day", "country", "refund", "revenue"} <= set(index.columns)
+    assert bool(index.loc["A0001", "refund"])
+    # No second per-order table next to the bucket state
+    assert sorted(p.name for p in cfg.metrics_state.parent.glob("metrics*")) == ["metrics.parquet"]
+
+    month = load_state(cfg.metrics_state, orders_path=cfg.order_key_index).buckets
+    month = month[month["grain"] == "month"].set_index("country")
+    assert month.loc["SA", ["orders", "refunds", "revenue"]].tolist() == [2, 1, 5.0]
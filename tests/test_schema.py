@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from bootcamp_data import schema
+from bootcamp_data.io import read_orders_csv, read_users_csv
+from bootcamp_data.schema import apply_schema, bytes_per_row, get_schema
+
+ORDERS_CSV = """order_id,user_id,amount,quantity,created_at,status
+A1,0001,12.50,2,2025-12-01T13:05:00+03:00,Paid
+A2,0001,x,40000,2025-12-01T10:00:00Z,refund
+A3,0002,7.25,1.5,not a date,paid
+"""
+
+USERS_CSV = """user_id,country,signup_date
+0001,SA,2025-11-01
+0002,AE,2025-11-02
+"""
+
+
+@pytest.fixture
+def orders(tmp_path):
+    path = tmp_path / "orders.csv"
+    path.write_text(ORDERS_CSV)
+    return read_orders_csv(path)
+
+
+def _no_casts(monkeypatch):
+    def fail(s, target):
+        raise AssertionError(f"{s.name} re-cast to {target}")
+
+    monkeypatch.setattr(schema, "_cast", fail)
+
+
+def test_read_orders_csv_applies_schema(orders):
+    for col, target in get_schema("orders").items():
+        if col in orders.columns:
+            assert str(orders[col].dtype) == target, col
+    # Leading zeros survive because user_id is never parsed as a number
+    assert list(orders["user_id"]) == ["0001", "0001", "0002"]
+    # Offsets are converted, not dropped
+    assert orders.loc[0, "created_at"] == pd.Timestamp("2025-12-01T10:05:00Z")
+    assert orders["created_at"].isna().tolist() == [False, False, True]
+    # Bad numbers become NA instead of failing the read
+    assert orders["amount"].isna().tolist() == [False, True, False]
+    assert orders["quantity"].isna().tolist() == [False, True, True]
+
+
+def test_read_users_csv_applies_schema(tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text(USERS_CSV)
+    users = read_users_csv(path)
+
+    assert str(users["user_id"].dtype) == "category"
+    assert str(users["country"].dtype) == "category"
+    assert str(users["signup_date"].dtype) == "datetime64[ns]"
+    assert list(users["user_id"]) == ["0001", "0002"]
+
+
+def test_apply_schema_is_noop_on_typed_frame(orders, monkeypatch):
+    _no_casts(monkeypatch)
+    assert apply_schema(orders, "orders") is orders
+
+
+def test_apply_schema_is_noop_after_parquet_round_trip(orders, tmp_path, monkeypatch):
+    orders.to_parquet(tmp_path / "orders.parquet", index=False)
+    back = pd.read_parquet(tmp_path / "orders.parquet")
+    _no_casts(monkeypatch)
+    apply_schema(back, "orders")
+
+
+def test_typed_read_uses_less_memory_than_untyped(tmp_path):
+    path = tmp_path / "orders.csv"
+    body = "".join(f"A{i},{i % 50:04d},{i % 90}.5,{i % 5},2025-12-01T10:00:00Z,paid\n" for i in range(2_000))
+    path.write_text(ORDERS_CSV.splitlines()[0] + "\n" + body)
+
+    untyped = pd.read_csv(path)
+    assert bytes_per_row(read_orders_csv(path)) < 0.6 * bytes_per_row(untyped)
@@ -0,0 +1,78 @@
+import pandas as pd
+
+from bootcamp_data.timeseries import aggregate, empty_state, load_state, update_state, write_state
+
+
+def _orders(rows):
+    df = pd.DataFrame(rows, columns=["order_id", "created_at", "country", "amount", "status_clean"])
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+    return df
+
+
+def _month(state):
+    b = state.buckets
+    return b[b["grain"] == "month"].set_index("country")[["orders", "refunds", "revenue"]]
+
+
+def test_replayed_order_replaces_previous_contribution(tmp_path):
+    path = tmp_path / "metrics.parquet"
+    first = _orders([("A1", "2025-12-01T10:00:00Z", "SA", 10.0, "paid")])
+    write_state(update_state(empty_state(), first), path)
+
+    replay = _orders([("A1", "2025-12-02T10:00:00Z", "SA", 10.0, "refund")])
+    state = update_state(load_state(path), replay)
+
+    month = _month(state)
+    assert month.loc["SA"].tolist() == [1, 1, 0.0]
+    # The old day bucket is emptied, not left behind with zero orders
+    days = state.buckets[state.buckets["grain"] == "day"]
+    assert len(days) == 1
+    assert len(state.orders) == 1
+
+
+def test_replay_moving_country_and_month_matches_full_rebuild():
+    first = _orders(
+        [
+            ("A1", "2025-11-30T23:00:00Z", "SA", 10.0, "paid"),
+            ("A2", "2025-12-01T10:00:00Z", "AE", 5.0, "paid"),
+        ]
+    )
+    replay = _orders([("A1", "2025-12-03T10:00:00Z", "AE", 7.5, "paid")])
+    state = update_state(update_state(empty_state(), first), replay)
+
+    latest = _orders(
+        [
+            ("A1", "2025-12-03T10:00:00Z", "AE", 7.5, "paid"),
+            ("A2", "2025-12-01T10:00:00Z", "AE", 5.0, "paid"),
+        ]
+    )
+    key = ["grain", "bucket", "country"]
+    got = state.buckets.sort_values(key).reset_index(drop=True)
+    want = aggregate(latest).sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, want, check_categorical=False)
+
+
+def test_resend_that_is_not_newer_is_ignored():
+    state = update_state(empty_state(), _orders([("A1", "2025-12-02T10:00:00Z", "SA", 10.0, "refund")]))
+
+    older = _orders([("A1", "2025-12-01T10:00:00Z", "AE", 99.0, "paid")])
+    same = _orders([("A1", "2025-12-02T10:00:00Z", "AE", 99.0, "paid")])
+    no_ts = _orders([("A1", None, "AE", 99.0, "paid")])
+    for resend in (older, same, no_ts):
+        after = update_state(state, resend)
+        pd.testing.assert_frame_equal(after.buckets, state.buckets)
+        pd.testing.assert_frame_equal(after.orders, state.orders)
+
+    newer = update_state(state, _orders([("A1", "2025-12-03T10:00:00Z", "SA", 12.0, "paid")]))
+    assert _month(newer).loc["SA"].tolist() == [1, 0, 12.0]
+    assert newer.orders["created_at"].tolist() == [pd.Timestamp("2025-12-03T10:00:00Z")]
+
+
+def test_orders_without_timestamp_are_recorded_but_not_counted():
+    state = update_state(empty_state(), _orders([("A1", None, "SA", 10.0, "paid"), ("A2", "2025-12-01T10:00:00Z", "SA", 5.0, "paid")]))
+    assert sorted(state.orders["order_id"]) == ["A1", "A2"]
+    assert _month(state).loc["SA"].tolist() == [1, 0, 5.0]
+
+    # A later version with a timestamp is counted once
+    state = update_state(state, _orders([("A1", "2025-12-02T10:00:00Z", "SA", 10.0, "paid")]))
+    assert _month(state).loc["SA"].tolist() == [2, 0, 15.0]